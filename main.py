@@ -1,17 +1,57 @@
 #!/usr/bin/env python3
 
 import argparse
+import fcntl
 import json
 import os
 import re
 import time
 import hashlib
 import shutil
+import sqlite3
+import stat
+import struct
 import sys
+import tempfile
+import threading
 import atexit
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from signal import signal, SIGTERM
 
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fastcdc
+except ImportError:
+    fastcdc = None
+
+# clonefile() из libSystem создаёт копию на APFS без копирования данных
+clonefile = None
+if sys.platform == 'darwin':
+    import ctypes
+    import ctypes.util
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        clonefile = libc.clonefile
+        clonefile.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32]
+        clonefile.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        clonefile = None
+
 # Константы для путей
 # PATH_TO_CONFIG_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
 # PATH_TO_CHECKSUMS_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'checksums.json')
@@ -20,9 +60,42 @@ from signal import signal, SIGTERM
 
 PATH_TO_CONFIG_JSON = '/etc/backupd/config.json'
 PATH_TO_CHECKSUMS_JSON = '/var/lib/backupd/checksums.json'
+PATH_TO_CHECKSUMS_DB = '/var/lib/backupd/checksums.db'
 LOG_FILE_PATH = '/var/log/backupd/backupd.log'
 PID_FILE = '/var/lib/backupd/backupd.pid'
 
+# Размер блока чтения при хешировании. Блок в 4 КиБ давал сотни вызовов
+# интерпретатора на каждый мегабайт; дальше 1 МиБ выигрыш почти не растёт,
+# а буфер лишь занимает память в каждом потоке
+CHUNK_SIZE = 1 << 20
+
+# Количество потоков для хеширования: hashlib и blake3 отпускают GIL,
+# поэтому чтение с диска и вычисление хеша разных файлов перекрываются
+HASH_WORKERS = min(32, (os.cpu_count() or 1) * 2)
+
+# Файлы от этого размера BLAKE3 хеширует сразу в нескольких потоках (по дереву хешей),
+# но не больше одного файла одновременно: пул HASH_WORKERS и так занимает все ядра.
+# Файлы поменьше и так распределяются по потокам HASH_WORKERS
+MULTITHREADED_HASH_THRESHOLD = 16 * 1024 * 1024
+
+# Контрольные суммы хранятся как '<алгоритм>:<hex>'. Суммы без префикса записаны
+# прежними версиями, и их алгоритм определяется по длине hex-строки
+LEGACY_CHECKSUM_ALGORITHMS = {16: 'xxh64', 32: 'md5', 64: 'blake3'}
+
+# Дедупликация: файлы делятся на чанки переменной длины (content-defined chunking),
+# уникальные чанки хранятся в <backup_destination>/.backupd-cas/<hash[:2]>/<hash>,
+# а для каждого файла пишется рецепт <backup_destination>/.backupd-recipes/<путь> со списком чанков.
+# Копия повторяет абсолютные пути исходных файлов, поэтому имена служебных папок
+# не должны совпадать с каталогами в корне ФС
+CDC_AVERAGE_CHUNK_SIZE = 8 * 1024
+CDC_MAXIMUM_CHUNK_SIZE = CDC_AVERAGE_CHUNK_SIZE * 8
+# Файл делится на чанки по мере чтения блоками такого размера, а не через mmap
+CDC_READ_BLOCK_SIZE = 16 * 1024 * 1024
+CAS_FOLDER_NAME = '.backupd-cas'
+RECIPES_FOLDER_NAME = '.backupd-recipes'
+# Префикс временных файлов в хранилище чанков и рецептов
+TEMPORARY_FILE_PREFIX = '.backupd-'
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -32,6 +105,13 @@ logging.basicConfig(
         logging.StreamHandler(sys.stdout)
     ]
 )
+logger = logging.getLogger(__name__)
+
+# Буфер чтения для хеширования: по одному на поток пула, а не на каждый файл
+hash_buffers = threading.local()
+multithreaded_hash_lock = threading.Lock()
+
+INVALID_MAC_PATH_PATTERN = re.compile(r'[\\:]')
 
 def remove_escape_characters(path):
     return path.replace('\\', '')
@@ -40,127 +120,458 @@ def is_valid_mac_path(path):
     path = remove_escape_characters(path)
     if not path.startswith('/'):
         return False
-    if re.search(r'[\\:]', path):
+    if INVALID_MAC_PATH_PATTERN.search(path):
         return False
     return True
 
-def get_config_file(path):
-    try:
-        with open(path, 'r+') as file:
-            config = json.load(file)
-
-            if 'interval' not in config or not isinstance(config['interval'], int) or config['interval'] < 0:
-                config['interval'] = 300
-                logging.warning("Некорректное значение 'interval' в конфигурации. Установлено значение по умолчанию 300.")
-
-            if 'backup_destination' not in config or not isinstance(config['backup_destination'], str) or not is_valid_mac_path(config['backup_destination']):
-                config_folder = os.path.dirname(os.path.abspath(path))
-                config['backup_destination'] = os.path.join(config_folder, 'backup/')
-                logging.warning("Некорректное значение 'backup_destination' в конфигурации. Установлен путь по умолчанию.")
+def json_loads(data):
+    # JSON-файлы читаются целиком через read(), а не через mmap: CLI перезаписывает
+    # config.json с усечением, и чтение отображения в этот момент завершило бы процесс по SIGBUS
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
-            if 'items_to_backup' not in config or not isinstance(config['items_to_backup'], list) or \
-                    not all(isinstance(item, str) and is_valid_mac_path(item) for item in config['items_to_backup']):
-                config['items_to_backup'] = []
-                logging.warning("Некорректное значение 'items_to_backup' в конфигурации. Установлен пустой список.")
+def json_dumps(json_object):
+    # orjson поддерживает только отступ в 2 пробела и всегда возвращает UTF-8
+    if orjson is not None:
+        return orjson.dumps(json_object, option=orjson.OPT_INDENT_2)
+    return json.dumps(json_object, ensure_ascii=False, indent=4).encode('utf-8')
 
-            file.seek(0)
-            json.dump(config, file, indent=4)
-            file.truncate()
+def validate_config(config, path):
+    """
+    Подставляет значения по умолчанию вместо некорректных полей конфигурации.
+    Возвращает True, если хотя бы одно поле было исправлено.
+    """
+    dirty = False
+    if 'interval' not in config or not isinstance(config['interval'], int) or config['interval'] < 0:
+        config['interval'] = 300
+        dirty = True
+        logger.warning("Некорректное значение 'interval' в конфигурации. Установлено значение по умолчанию 300.")
+
+    if 'backup_destination' not in config or not isinstance(config['backup_destination'], str) or not is_valid_mac_path(config['backup_destination']):
+        config_folder = os.path.dirname(os.path.abspath(path))
+        config['backup_destination'] = os.path.join(config_folder, 'backup/')
+        dirty = True
+        logger.warning("Некорректное значение 'backup_destination' в конфигурации. Установлен путь по умолчанию.")
+
+    if 'items_to_backup' not in config or not isinstance(config['items_to_backup'], list) or \
+            not all(isinstance(item, str) and is_valid_mac_path(item) for item in config['items_to_backup']):
+        config['items_to_backup'] = []
+        dirty = True
+        logger.warning("Некорректное значение 'items_to_backup' в конфигурации. Установлен пустой список.")
+
+    if 'deduplication' in config and not isinstance(config['deduplication'], bool):
+        config['deduplication'] = False
+        dirty = True
+        logger.warning("Некорректное значение 'deduplication' в конфигурации. Дедупликация отключена.")
+
+    return dirty
+
+def load_config(path):
+    """
+    Загружает конфигурацию без перезаписи файла.
+    """
+    try:
+        with open(path, 'rb') as file:
+            config = json_loads(file.read())
+        validate_config(config, path)
+        logger.info(f"Конфигурационный файл '{path}' успешно загружен.")
+        return config
+    except json.JSONDecodeError:
+        logger.error(f"Файл '{path}' содержит некорректные данные JSON.")
+        sys.exit(1)
 
-            logging.info(f"Конфигурационный файл '{path}' успешно загружен.")
+def get_config_file(path):
+    try:
+        with open(path, 'r+b') as file:
+            config = json_loads(file.read())
+            if validate_config(config, path):
+                file.seek(0)
+                file.write(json_dumps(config))
+                file.truncate()
+
+            logger.info(f"Конфигурационный файл '{path}' успешно загружен.")
             return config
 
     except FileNotFoundError:
-        logging.warning(f"Файл '{path}' не найден. Создаётся новый файл с настройками по умолчанию.")
+        logger.warning(f"Файл '{path}' не найден. Создаётся новый файл с настройками по умолчанию.")
         config = {
             "interval": 300,
             "backup_destination": os.path.join(os.path.dirname(os.path.abspath(path)), 'backup/'),
             "items_to_backup": []
         }
-        with open(path, 'w+') as file:
-            json.dump(config, file, indent=4)
+        with open(path, 'wb') as file:
+            file.write(json_dumps(config))
         return config
 
     except json.JSONDecodeError:
-        logging.error(f"Файл '{path}' содержит некорректные данные JSON.")
+        logger.error(f"Файл '{path}' содержит некорректные данные JSON.")
         sys.exit(1)
 
 def save_json_file(json_object, path_to_json_file):
     try:
-        with open(path_to_json_file, 'w', encoding='utf-8') as config_file:
-            json.dump(json_object, config_file, ensure_ascii=False, indent=4)
-        logging.info(f"Конфигурация успешно сохранена в '{path_to_json_file}'.")
+        with open(path_to_json_file, 'wb') as config_file:
+            config_file.write(json_dumps(json_object))
+        logger.info(f"Конфигурация успешно сохранена в '{path_to_json_file}'.")
     except Exception as e:
-        logging.error(f"Ошибка при сохранении конфигурации: {e}")
+        logger.error(f"Ошибка при сохранении конфигурации: {e}")
 
 def is_path_exist(path):
-    if os.path.exists(path):
-        if os.path.isfile(path):
-            return 'file'
-        elif os.path.isdir(path):
-            return 'directory'
-    else:
+    # Один stat() вместо отдельных exists/isfile/isdir
+    try:
+        mode = os.stat(path).st_mode
+    except (OSError, ValueError):
         return 'not exists'
-
-def not_included_in_other_directories(path, list_of_paths):
-    for other_path in list_of_paths:
-        if path != other_path and os.path.commonpath([path, other_path]) == other_path:
-            return False
-    return True
+    if stat.S_ISREG(mode):
+        return 'file'
+    elif stat.S_ISDIR(mode):
+        return 'directory'
 
 def get_files_from_directory(directory_path):
+    """
+    Возвращает DirEntry всех файлов в директории и её поддиректориях.
+    DirEntry кеширует результат stat(), поэтому файл не приходится опрашивать повторно.
+    """
     files_list = []
-    for root, dirs, files in os.walk(directory_path):
-        for file in files:
-            files_list.append(os.path.join(root, file))
+    directories = [directory_path]
+    while directories:
+        try:
+            with os.scandir(directories.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            directories.append(entry.path)
+                        elif entry.is_file():
+                            files_list.append(entry)
+                    except OSError:
+                        continue
+        except OSError:
+            # Как и os.walk, пропускаем директории, которые не удалось прочитать
+            continue
     return files_list
 
 def get_filtered_files_list(list_of_paths):
-    absolute_paths = [os.path.realpath(path) for path in list_of_paths]
-    existing_paths = [(path, is_path_exist(path)) for path in absolute_paths if is_path_exist(path) != 'not exists']
-    existing_paths_set = set([p[0] for p in existing_paths])
+    path_types = {}
+    for path in list_of_paths:
+        absolute_path = os.path.realpath(path)
+        if absolute_path not in path_types:
+            path_types[absolute_path] = is_path_exist(absolute_path)
+
+    # Префиксное дерево по компонентам пути: ключ None отмечает конец уже оставленного пути.
+    # После сортировки родительские пути добавляются раньше вложенных, и вложенный путь
+    # отбрасывается, как только при спуске по дереву встречается такая отметка
+    paths_trie = {}
     pre_filtered_paths = []
-    for path, path_type in existing_paths:
-        if not_included_in_other_directories(path, existing_paths_set):
+    for path in sorted(path_types):
+        path_type = path_types[path]
+        if path_type == 'not exists':
+            continue
+        node = paths_trie
+        for part in path.split(os.sep):
+            if None in node:
+                break
+            if part:
+                node = node.setdefault(part, {})
+        else:
+            node[None] = True
             pre_filtered_paths.append((path, path_type))
-    final_paths = set()
+    # Путь файла -> его DirEntry (None для файлов, указанных в конфигурации напрямую)
+    final_paths = {}
     for path, path_type in pre_filtered_paths:
         if path_type == 'directory':
-            final_paths.update(get_files_from_directory(path))
+            for entry in get_files_from_directory(path):
+                final_paths[entry.path] = entry
         elif path_type == 'file':
-            final_paths.add(path)
-    return list(final_paths)
+            final_paths.setdefault(path, None)
+    return final_paths
+
+def get_checksum_algorithm():
+    # Контрольная сумма нужна только для обнаружения изменений, поэтому
+    # криптостойкость не требуется: берём самый быстрый из доступных хешей
+    if blake3 is not None:
+        return 'blake3'
+    if xxhash is not None:
+        return 'xxh64'
+    return 'md5'
+
+def is_checksum_algorithm_available(algorithm):
+    if algorithm == 'blake3':
+        return blake3 is not None
+    if algorithm == 'xxh64':
+        return xxhash is not None
+    return algorithm == 'md5'
+
+def split_checksum(checksum):
+    algorithm, separator, digest = checksum.rpartition(':')
+    if not separator:
+        return LEGACY_CHECKSUM_ALGORITHMS.get(len(checksum)), checksum
+    return algorithm, digest
+
+def advise_sequential_read(fd, size):
+    # Подсказываем ядру, что файл будет прочитан целиком и последовательно
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        elif hasattr(fcntl, 'F_RDADVISE'):
+            # macOS: struct radvisory {off_t ra_offset; int ra_count;}
+            fcntl.fcntl(fd, fcntl.F_RDADVISE, struct.pack('qi4x', 0, min(size, 2**31 - 1)))
+    except OSError:
+        pass
+
+def advise_drop_cache(fd):
+    # Файл больше не нужен в этом цикле: освобождаем его страницы в кеше,
+    # чтобы резервное копирование не вытесняло данные других программ
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
 
-def calculate_checksum(file_path):
+def drop_file_cache(path):
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        advise_drop_cache(fd)
+    finally:
+        os.close(fd)
+
+def get_hash_buffer():
+    buffer = getattr(hash_buffers, 'buffer', None)
+    if buffer is None:
+        buffer = hash_buffers.buffer = bytearray(CHUNK_SIZE)
+    return buffer
+
+def calculate_checksum(file_path, algorithm=None):
+    if algorithm is None:
+        algorithm = get_checksum_algorithm()
     try:
-        md5_hash = hashlib.md5()
         with open(file_path, "rb") as file:
-            for chunk in iter(lambda: file.read(4096), b""):
-                md5_hash.update(chunk)
-        return md5_hash.hexdigest()
+            file_size = os.fstat(file.fileno()).st_size
+            advise_sequential_read(file.fileno(), file_size)
+            # Если большой файл уже хешируется в несколько потоков, этот хешируется в одном
+            multithreaded = (algorithm == 'blake3' and file_size >= MULTITHREADED_HASH_THRESHOLD
+                             and multithreaded_hash_lock.acquire(blocking=False))
+            try:
+                if algorithm == 'blake3':
+                    file_hash = blake3.blake3(max_threads=blake3.blake3.AUTO if multithreaded else 1)
+                elif algorithm == 'xxh64':
+                    file_hash = xxhash.xxh64()
+                else:
+                    file_hash = hashlib.md5()
+                # Большие файлы не отображаются в память через mmap: хешируются чужие «живые» файлы,
+                # и если файл усекут во время чтения отображения, процесс получит SIGBUS.
+                # Блоки читаются через readinto() в буфер потока,
+                # без нового объекта bytes на каждый блок
+                buffer = get_hash_buffer()
+                with memoryview(buffer) as view:
+                    while True:
+                        read_size = file.readinto(buffer)
+                        if not read_size:
+                            break
+                        file_hash.update(view[:read_size])
+            finally:
+                if multithreaded:
+                    multithreaded_hash_lock.release()
+        return f"{algorithm}:{file_hash.hexdigest()}"
     except (FileNotFoundError, PermissionError) as e:
-        logging.error(f"Ошибка доступа к файлу '{file_path}': {e}")
+        logger.error(f"Ошибка доступа к файлу '{file_path}': {e}")
         return None
     except Exception as e:
-        logging.error(f"Ошибка при вычислении контрольной суммы файла '{file_path}': {e}")
+        logger.error(f"Ошибка при вычислении контрольной суммы файла '{file_path}': {e}")
         return None
 
+def is_file_changed(file_path, previous_checksum):
+    """
+    Хеширует файл и сравнивает сумму с сохранённой. Если сохранённую сумму посчитал
+    другой алгоритм (например, после установки или удаления blake3/xxhash), файл
+    хешируется ещё и этим алгоритмом, чтобы не копировать заново неизменённые файлы.
+    Возвращает контрольную сумму и признак изменения файла.
+    """
+    checksum = calculate_checksum(file_path)
+    if checksum is None or previous_checksum is None:
+        return checksum, True
+    previous_algorithm, previous_digest = split_checksum(previous_checksum)
+    if previous_algorithm != get_checksum_algorithm():
+        if not is_checksum_algorithm_available(previous_algorithm):
+            return checksum, True
+        recalculated_checksum = calculate_checksum(file_path, previous_algorithm)
+        if recalculated_checksum is None:
+            return checksum, True
+        return checksum, split_checksum(recalculated_checksum)[1] != previous_digest
+    return checksum, split_checksum(checksum)[1] != previous_digest
+
 def get_checksums_json(path):
     try:
-        with open(path, 'r+') as file:
-            checksums = json.load(file)
-        logging.info(f"Файл контрольных сумм '{path}' успешно загружен.")
+        with open(path, 'rb') as file:
+            checksums = json_loads(file.read())
+        logger.info(f"Файл контрольных сумм '{path}' успешно загружен.")
         return checksums
     except FileNotFoundError:
-        logging.warning(f"Файл контрольных сумм '{path}' не найден. Создаётся новый файл.")
+        logger.warning(f"Файл контрольных сумм '{path}' не найден. Создаётся новый файл.")
         checksums = {}
-        with open(path, 'w+') as file:
-            json.dump(checksums, file, indent=4)
+        with open(path, 'wb') as file:
+            file.write(json_dumps(checksums))
         return checksums
     except json.JSONDecodeError:
-        logging.error(f"Файл контрольных сумм '{path}' содержит некорректные данные JSON.")
+        logger.error(f"Файл контрольных сумм '{path}' содержит некорректные данные JSON.")
         sys.exit(1)
 
+def open_checksums_db(path):
+    """
+    Открывает базу контрольных сумм. При первом открытии переносит в неё
+    записи из checksums.json, если он остался от прошлых версий.
+    """
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS checksums ("
+        "path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, hash TEXT)"
+    )
+    connection.execute("CREATE TABLE IF NOT EXISTS chunks (hash TEXT PRIMARY KEY, size INTEGER)")
+    if os.path.exists(PATH_TO_CHECKSUMS_JSON):
+        migrate_checksums_json(connection, PATH_TO_CHECKSUMS_JSON)
+    return connection
+
+def migrate_checksums_json(connection, path):
+    checksums = get_checksums_json(path)
+    rows = []
+    for file_path, file_state in checksums.items():
+        # Записи старого формата содержат только контрольную сумму
+        if isinstance(file_state, list):
+            rows.append((file_path, *file_state))
+        else:
+            rows.append((file_path, None, None, file_state))
+
+    connection.execute("BEGIN")
+    connection.executemany("INSERT OR REPLACE INTO checksums VALUES (?, ?, ?, ?)", rows)
+    connection.execute("COMMIT")
+    os.replace(path, path + '.migrated')
+    logger.info(f"Контрольные суммы из '{path}' перенесены в базу данных ({len(rows)} записей).")
+
+def get_checksums(connection):
+    return {row[0]: list(row[1:]) for row in connection.execute("SELECT path, size, mtime, hash FROM checksums")}
+
+def reload_config_if_changed(path, state):
+    """
+    Перечитывает конфигурацию, только если файл изменился с прошлой загрузки.
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = None
+
+    if state['config'] is not None and mtime_ns is not None and mtime_ns == state['mtime_ns']:
+        return state['config']
+
+    if state['config'] is None or mtime_ns is None:
+        # Первая загрузка: создаём файл, если его нет, и сохраняем исправленные поля
+        state['config'] = get_config_file(path)
+        mtime_ns = os.stat(path).st_mtime_ns
+    else:
+        state['config'] = load_config(path)
+    state['mtime_ns'] = mtime_ns
+    return state['config']
+
+def reload_checksums_if_changed(connection, state):
+    """
+    Перечитывает контрольные суммы, только если базу изменило другое соединение
+    (например, команды clear_destination или change_destination).
+    """
+    data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+    if state['checksums'] is None or data_version != state['data_version']:
+        state['checksums'] = get_checksums(connection)
+        state['data_version'] = data_version
+    return state['checksums']
+
+def save_file_state(connection, file_path, file_state):
+    try:
+        connection.execute(
+            "INSERT INTO checksums VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, hash = excluded.hash",
+            (file_path, *file_state)
+        )
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при сохранении контрольной суммы файла '{file_path}': {e}")
+        return False
+
+def clear_checksums_db(path):
+    try:
+        connection = open_checksums_db(path)
+        connection.execute("DELETE FROM checksums")
+        connection.execute("DELETE FROM chunks")
+        connection.close()
+        logger.info(f"База контрольных сумм '{path}' успешно очищена.")
+        print(f"База контрольных сумм '{path}' успешно очищена.")
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при очистке базы контрольных сумм '{path}': {e}")
+
+def clone_file(source, destination):
+    # clonefile() не перезаписывает существующий файл, поэтому клонируем во временный и подменяем
+    temporary_destination = destination + '.backupd-clone'
+    if clonefile(os.fsencode(source), os.fsencode(temporary_destination), 0) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error), source)
+    os.replace(temporary_destination, destination)
+
+def copy_file_data(source, destination):
+    """
+    Копирует содержимое файла без прогона данных через Python:
+    clonefile() на macOS, copy_file_range() на Linux (reflink на btrfs/XFS),
+    затем sendfile() на Linux, иначе shutil.copyfile.
+    """
+    if clonefile is not None:
+        try:
+            clone_file(source, destination)
+            return
+        except OSError:
+            pass
+
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(source, 'rb') as source_file, open(destination, 'wb') as destination_file:
+                size = os.fstat(source_file.fileno()).st_size
+                count = max(size, CHUNK_SIZE)
+                copied = 0
+                while True:
+                    written = os.copy_file_range(source_file.fileno(), destination_file.fileno(), count)
+                    if written == 0:
+                        break
+                    copied += written
+            # Некоторые ФС (например, FUSE) возвращают 0 раньше конца файла, а у псевдофайлов
+            # procfs и sysfs st_size равен 0 — в обоих случаях копируем следующим способом
+            if copied and copied >= size:
+                return
+        except OSError:
+            # Например, EXDEV для разных файловых систем на старых ядрах
+            pass
+
+    # На macOS sendfile() умеет писать только в сокет
+    if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+        try:
+            with open(source, 'rb') as source_file, open(destination, 'wb') as destination_file:
+                size = os.fstat(source_file.fileno()).st_size
+                # Как и shutil, копируем до конца файла, а не до st_size: у псевдофайлов
+                # procfs и sysfs он равен 0, а файл мог вырасти после fstat()
+                count = max(size, CHUNK_SIZE)
+                offset = 0
+                while True:
+                    sent = os.sendfile(destination_file.fileno(), source_file.fileno(), offset, count)
+                    if sent == 0:
+                        break
+                    offset += sent
+            if offset >= size:
+                return
+        except OSError:
+            pass
+
+    shutil.copyfile(source, destination)
+
 def copy_file(source, destination):
     try:
         if os.path.isdir(destination):
@@ -170,32 +581,239 @@ def copy_file(source, destination):
         destination_folder = os.path.dirname(destination)
         if not os.path.exists(destination_folder):
             os.makedirs(destination_folder)
-        shutil.copy2(source, destination)
-        logging.info(f"Файл '{source}' успешно скопирован в '{destination}'.")
+        copy_file_data(source, destination)
+        shutil.copystat(source, destination)
+        logger.info(f"Файл '{source}' успешно скопирован в '{destination}'.")
+        return True
     except Exception as e:
-        logging.error(f"Ошибка при копировании файла из '{source}' в '{destination}': {e}")
+        logger.error(f"Ошибка при копировании файла из '{source}' в '{destination}': {e}")
+        return False
 
-def daemon_main():
+def chunk_digest(data):
+    # Хеш чанка служит его адресом в хранилище, поэтому здесь нужен криптостойкий хеш
+    if blake3 is not None:
+        return blake3.blake3(data).hexdigest()
+    return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+def write_file_atomically(path, data):
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    # Рецепты повторяют имена файлов пользователя, поэтому имя вида path + '.tmp' могло
+    # совпасть с рецептом соседнего файла. mkstemp создаёт новый файл с уникальным именем
+    fd, temporary_path = tempfile.mkstemp(dir=folder, prefix=TEMPORARY_FILE_PREFIX, suffix='.tmp')
+    try:
+        with open(fd, 'wb') as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+    except Exception:
+        remove_file_if_exists(temporary_path)
+        raise
+
+def remove_file_if_exists(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def iter_file_chunks(file):
+    """
+    Делит открытый файл на чанки FastCDC, читая его блоками по CDC_READ_BLOCK_SIZE.
+    """
+    buffer = b''
     while True:
-        config = get_config_file(PATH_TO_CONFIG_JSON)
-        list_of_file_paths = get_filtered_files_list(config['items_to_backup'])
-        checksums = get_checksums_json(PATH_TO_CHECKSUMS_JSON)
+        block = file.read(CDC_READ_BLOCK_SIZE)
+        end_of_file = not block
+        buffer = buffer + block if buffer else block
+        consumed = 0
+        for chunk in fastcdc.fastcdc(buffer, avg_size=CDC_AVERAGE_CHUNK_SIZE, max_size=CDC_MAXIMUM_CHUNK_SIZE, fat=True):
+            # Граница чанка зависит только от CDC_MAXIMUM_CHUNK_SIZE байт от его начала,
+            # поэтому чанк у конца буфера режется заново после чтения следующего блока
+            if not end_of_file and chunk.offset + CDC_MAXIMUM_CHUNK_SIZE > len(buffer):
+                break
+            consumed = chunk.offset + chunk.length
+            yield chunk.data
+        if end_of_file:
+            return
+        buffer = buffer[consumed:]
+
+def backup_file_chunks(connection, source, chunks_root, recipe_path, backup_path):
+    """
+    Сохраняет файл в хранилище чанков: записываются только чанки, которых ещё нет
+    в таблице chunks, и рецепт файла со списком хешей его чанков.
+    """
+    try:
+        chunk_hashes = []
+        # Файл читается обычным read(): fastcdc, получив путь, отображает файл в память,
+        # и усечение файла во время чтения завершило бы демон по SIGBUS
+        with open(source, 'rb') as source_file:
+            source_stat = os.fstat(source_file.fileno())
+            connection.execute("BEGIN")
+            for chunk_data in iter_file_chunks(source_file):
+                chunk_hash = chunk_digest(chunk_data)
+                chunk_hashes.append(chunk_hash)
+                chunk_path = f"{chunks_root}{chunk_hash[:2]}{os.sep}{chunk_hash}"
+                # Таблица chunks не привязана к backup_destination: если папку сменили или
+                # очистили в обход CLI, чанк из таблицы может отсутствовать в хранилище
+                if (connection.execute("SELECT 1 FROM chunks WHERE hash = ?", (chunk_hash,)).fetchone()
+                        and os.path.exists(chunk_path)):
+                    continue
+                write_file_atomically(chunk_path, chunk_data)
+                connection.execute("INSERT OR REPLACE INTO chunks VALUES (?, ?)", (chunk_hash, len(chunk_data)))
+            connection.execute("COMMIT")
+
+        recipe = {
+            "size": source_stat.st_size,
+            "mode": stat.S_IMODE(source_stat.st_mode),
+            "mtime_ns": source_stat.st_mtime_ns,
+            "chunks": chunk_hashes
+        }
+        write_file_atomically(recipe_path, json_dumps(recipe))
+        # Полная копия от запуска без дедупликации больше не актуальна
+        remove_file_if_exists(backup_path)
+        logger.info(f"Файл '{source}' успешно сохранён в хранилище чанков ({len(chunk_hashes)} чанков).")
+        return True
+    except Exception as e:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        logger.error(f"Ошибка при сохранении файла '{source}' в хранилище чанков: {e}")
+        return False
 
-        for file_path in list_of_file_paths:
-            file_checksum = calculate_checksum(file_path)
-            if file_checksum is None:
+def restore_chunked_files(backup_folder, target_dir):
+    """
+    Собирает файлы по рецептам из хранилища чанков. Файл, который не удалось собрать,
+    пропускается, чтобы не прерывать восстановление остальных. Возвращает число таких файлов.
+    """
+    recipes_folder = os.path.join(backup_folder, RECIPES_FOLDER_NAME)
+    failed_files_count = 0
+    for root, dirs, files in os.walk(recipes_folder):
+        for file in files:
+            # Недописанный рецепт, оставшийся после сбоя
+            if file.startswith(TEMPORARY_FILE_PREFIX) and file.endswith('.tmp'):
                 continue
+            recipe_path = os.path.join(root, file)
+            destination_file = os.path.join(target_dir, os.path.relpath(recipe_path, recipes_folder))
+            try:
+                with open(recipe_path, 'rb') as recipe_file:
+                    recipe = json_loads(recipe_file.read())
+                chunk_paths = [os.path.join(backup_folder, CAS_FOLDER_NAME, chunk_hash[:2], chunk_hash) for chunk_hash in recipe['chunks']]
+                for chunk_path in chunk_paths:
+                    if not os.path.exists(chunk_path):
+                        raise FileNotFoundError(f"В хранилище нет чанка '{os.path.basename(chunk_path)}'")
+
+                os.makedirs(os.path.dirname(destination_file), exist_ok=True)
+                with open(destination_file, 'wb') as destination:
+                    for chunk_path in chunk_paths:
+                        with open(chunk_path, 'rb') as chunk_file:
+                            destination.write(chunk_file.read())
+                os.chmod(destination_file, recipe['mode'])
+                os.utime(destination_file, ns=(recipe['mtime_ns'], recipe['mtime_ns']))
+            except Exception as e:
+                failed_files_count += 1
+                logger.error(f"Ошибка при восстановлении файла '{destination_file}' по рецепту '{recipe_path}': {e}")
+    return failed_files_count
+
+def setup_daemon():
+    """
+    Создаёт ресурсы, которые живут всё время работы демона: соединение с базой
+    контрольных сумм, пул потоков для хеширования и последнюю загруженную конфигурацию.
+    """
+    try:
+        connection = open_checksums_db(PATH_TO_CHECKSUMS_DB)
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при открытии базы контрольных сумм '{PATH_TO_CHECKSUMS_DB}': {e}")
+        sys.exit(1)
 
-            backup_file_checksum = checksums.get(file_path, "0")
+    executor = ThreadPoolExecutor(max_workers=HASH_WORKERS)
+    atexit.register(connection.close)
+    atexit.register(executor.shutdown)
 
-            if file_checksum != backup_file_checksum:
-                checksums[file_path] = file_checksum
-                backup_destination = os.path.join(config['backup_destination'], os.path.relpath(file_path, '/'))
-                copy_file(file_path, backup_destination)
+    state = {
+        'connection': connection,
+        'executor': executor,
+        'config_state': {'mtime_ns': None, 'config': None},
+        'checksums_state': {'data_version': None, 'checksums': None}
+    }
+    reload_config_if_changed(PATH_TO_CONFIG_JSON, state['config_state'])
+    return state
 
-        save_json_file(checksums, PATH_TO_CHECKSUMS_JSON)
-        logging.info("Цикл резервного копирования завершён. Ожидание следующего запуска...")
-        time.sleep(config["interval"])
+def run_backup_cycle(state):
+    """
+    Выполняет один проход резервного копирования.
+    """
+    connection = state['connection']
+    config = reload_config_if_changed(PATH_TO_CONFIG_JSON, state['config_state'])
+    files_to_backup = get_filtered_files_list(config['items_to_backup'])
+    checksums = reload_checksums_if_changed(connection, state['checksums_state'])
+
+    deduplication = config.get('deduplication', False)
+    if deduplication and fastcdc is None:
+        logger.warning("Для дедупликации требуется пакет 'fastcdc'. Файлы будут скопированы целиком.")
+        deduplication = False
+
+    # Пути файлов абсолютные и нормализованные, поэтому пути в резервной копии
+    # строятся конкатенацией строк, без os.path.join и os.path.relpath на каждый файл
+    destination_root = config['backup_destination'].rstrip(os.sep) + os.sep
+    recipes_root = f"{destination_root}{RECIPES_FOLDER_NAME}{os.sep}"
+    chunks_root = f"{destination_root}{CAS_FOLDER_NAME}{os.sep}"
+
+    # Файлы с неизменными размером и временем изменения не перечитываются
+    files_to_hash = []
+    for file_path, entry in files_to_backup.items():
+        try:
+            file_stat = entry.stat() if entry is not None else os.stat(file_path)
+        except OSError as e:
+            logger.error(f"Ошибка доступа к файлу '{file_path}': {e}")
+            continue
+        backup_state = checksums.get(file_path)
+        if backup_state is None or backup_state[:2] != [file_stat.st_size, file_stat.st_mtime_ns]:
+            files_to_hash.append((file_path, file_stat))
+
+    file_checksums = list(state['executor'].map(
+        is_file_changed,
+        [file_path for file_path, _ in files_to_hash],
+        [checksums[file_path][2] if file_path in checksums else None for file_path, _ in files_to_hash]
+    ))
+
+    # База контрольных сумм обновляется и файлы копируются только в основном потоке
+    copied_files_count = 0
+    for (file_path, file_stat), (file_checksum, file_changed) in zip(files_to_hash, file_checksums):
+        if file_checksum is None:
+            continue
+
+        try:
+            if file_changed:
+                relative_path = file_path[1:]
+                backup_path = destination_root + relative_path
+                recipe_path = recipes_root + relative_path
+                if deduplication:
+                    copied = backup_file_chunks(connection, file_path, chunks_root, recipe_path, backup_path)
+                else:
+                    copied = copy_file(file_path, backup_path)
+                    if copied:
+                        # Рецепт от запуска с дедупликацией больше не актуален
+                        remove_file_if_exists(recipe_path)
+                # Состояние файла сохраняется только после успешного копирования,
+                # иначе в следующем цикле файл посчитается уже скопированным
+                if not copied:
+                    continue
+                copied_files_count += 1
+
+            file_state = [file_stat.st_size, file_stat.st_mtime_ns, file_checksum]
+            if save_file_state(connection, file_path, file_state):
+                checksums[file_path] = file_state
+        finally:
+            # Страницы файла освобождаются, только когда он больше не нужен в этом цикле:
+            # после копирования, а если копировать не нужно — сразу после хеширования
+            drop_file_cache(file_path)
+
+    logger.info(f"Проверено файлов: {len(files_to_backup)}, перехешировано: {len(files_to_hash)}, скопировано: {copied_files_count}.")
+    logger.info("Цикл резервного копирования завершён. Ожидание следующего запуска...")
+
+def daemon_main():
+    state = setup_daemon()
+    while True:
+        run_backup_cycle(state)
+        time.sleep(state['config_state']['config']['interval'])
 
 def start_daemon():
     """
@@ -203,7 +821,7 @@ def start_daemon():
     """
     # Создаем необходимые директории, если они не существуют
     os.makedirs(os.path.dirname(LOG_FILE_PATH), exist_ok=True)
-    os.makedirs(os.path.dirname(PATH_TO_CHECKSUMS_JSON), exist_ok=True)
+    os.makedirs(os.path.dirname(PATH_TO_CHECKSUMS_DB), exist_ok=True)
 
     # pidfile = '/tmp/backupd.pid'
     pidfile = PID_FILE
@@ -212,20 +830,20 @@ def start_daemon():
         with open(pidfile, 'r') as f:
             pid = f.read().strip()
             if pid:
-                logging.error(f"Демон уже запущен с PID: {pid}")
+                logger.error(f"Демон уже запущен с PID: {pid}")
                 print(f"Демон уже запущен с PID: {pid}")
                 sys.exit(1)
 
     def remove_pidfile():
         os.remove(pidfile)
-        logging.info("Демон остановлен и PID-файл удалён.")
+        logger.info("Демон остановлен и PID-файл удалён.")
 
     # try:
     #     pid = os.fork()
     #     if pid > 0:
     #         sys.exit(0)
     # except OSError as e:
-    #     logging.error(f"Ошибка форка: {e}")
+    #     logger.error(f"Ошибка форка: {e}")
     #     sys.exit(1)
 
     # os.setsid()
@@ -235,7 +853,7 @@ def start_daemon():
     #     if pid > 0:
     #         sys.exit(0)
     # except OSError as e:
-    #     logging.error(f"Ошибка второго форка: {e}")
+    #     logger.error(f"Ошибка второго форка: {e}")
     #     sys.exit(1)
 
     # sys.stdout.flush()
@@ -256,7 +874,7 @@ def start_daemon():
     atexit.register(remove_pidfile)
     signal(SIGTERM, lambda signum, frame: sys.exit(0))
 
-    logging.info("Демон успешно запущен.")
+    logger.info("Демон успешно запущен.")
     daemon_main()
 
 def stop_daemon():
@@ -270,25 +888,25 @@ def stop_daemon():
             pid = int(f.read().strip())
             try:
                 os.kill(pid, SIGTERM)
-                logging.info(f"Демон с PID {pid} успешно остановлен.")
+                logger.info(f"Демон с PID {pid} успешно остановлен.")
             except OSError as e:
-                logging.error(f"Ошибка при остановке демона с PID {pid}: {e}")
+                logger.error(f"Ошибка при остановке демона с PID {pid}: {e}")
         os.remove(pidfile)
-        logging.info(f"PID-файл {pidfile} удалён.")
+        logger.info(f"PID-файл {pidfile} удалён.")
     else:
-        logging.warning(f"PID-файл не найден. Демон, возможно, не был запущен.")
+        logger.warning(f"PID-файл не найден. Демон, возможно, не был запущен.")
 
 def list_backup_items():
     config = get_config_file(PATH_TO_CONFIG_JSON)
     items = config.get('items_to_backup', [])
 
     if items:
-        logging.info("Получен список файлов и папок для резервного копирования.")
+        logger.info("Получен список файлов и папок для резервного копирования.")
         print("Список файлов и папок для резервного копирования:")
         for item in items:
             print(f" - {item}")
     else:
-        logging.info("Список файлов и папок для резервного копирования пуст.")
+        logger.info("Список файлов и папок для резервного копирования пуст.")
         print("Список файлов и папок для резервного копирования пуст.")
 
 def add_backup_item(item_path):
@@ -296,13 +914,13 @@ def add_backup_item(item_path):
     absolute_path = remove_escape_characters(absolute_path)
 
     if not is_valid_mac_path(absolute_path):
-        logging.error(f"Ошибка: Путь '{item_path}' некорректен.")
+        logger.error(f"Ошибка: Путь '{item_path}' некорректен.")
         print(f"Ошибка: Путь '{item_path}' некорректен.")
         return
 
     path_type = is_path_exist(absolute_path)
     if path_type == 'not exists':
-        logging.error(f"Ошибка: Путь '{absolute_path}' не существует.")
+        logger.error(f"Ошибка: Путь '{absolute_path}' не существует.")
         print(f"Ошибка: Путь '{absolute_path}' не существует.")
         return
 
@@ -310,7 +928,7 @@ def add_backup_item(item_path):
     items_to_backup = config.get('items_to_backup', [])
 
     if absolute_path in items_to_backup:
-        logging.info(f"Путь '{absolute_path}' уже находится в списке резервного копирования.")
+        logger.info(f"Путь '{absolute_path}' уже находится в списке резервного копирования.")
         print(f"Путь '{absolute_path}' уже находится в списке резервного копирования.")
         return
 
@@ -318,7 +936,7 @@ def add_backup_item(item_path):
     config['items_to_backup'] = items_to_backup
     save_json_file(config, PATH_TO_CONFIG_JSON)
 
-    logging.info(f"Путь '{absolute_path}' успешно добавлен в список резервного копирования.")
+    logger.info(f"Путь '{absolute_path}' успешно добавлен в список резервного копирования.")
     print(f"Путь '{absolute_path}' успешно добавлен в список резервного копирования.")
 
 def remove_backup_item(item_path):
@@ -326,13 +944,13 @@ def remove_backup_item(item_path):
     absolute_path = remove_escape_characters(absolute_path)
 
     if not is_valid_mac_path(absolute_path):
-        logging.error(f"Ошибка: Путь '{item_path}' некорректен.")
+        logger.error(f"Ошибка: Путь '{item_path}' некорректен.")
         print(f"Ошибка: Путь '{item_path}' некорректен.")
         return
 
     path_type = is_path_exist(absolute_path)
     if path_type == 'not exists':
-        logging.error(f"Ошибка: Путь '{absolute_path}' не существует.")
+        logger.error(f"Ошибка: Путь '{absolute_path}' не существует.")
         print(f"Ошибка: Путь '{absolute_path}' не существует.")
         return
 
@@ -343,15 +961,15 @@ def remove_backup_item(item_path):
         items_to_backup.remove(absolute_path)
         config['items_to_backup'] = items_to_backup
         save_json_file(config, PATH_TO_CONFIG_JSON)
-        logging.info(f"Путь '{absolute_path}' успешно удалён из списка резервного копирования.")
+        logger.info(f"Путь '{absolute_path}' успешно удалён из списка резервного копирования.")
         print(f"Путь '{absolute_path}' успешно удалён из списка резервного копирования.")
     else:
-        logging.warning(f"Путь '{absolute_path}' не найден в списке резервного копирования.")
+        logger.warning(f"Путь '{absolute_path}' не найден в списке резервного копирования.")
         print(f"Путь '{absolute_path}' не найден в списке резервного копирования.")
 
 def update_sleep_interval(interval):
     if not isinstance(interval, int) or interval <= 0:
-        logging.error(f"Ошибка: Интервал '{interval}' должен быть положительным целым числом.")
+        logger.error(f"Ошибка: Интервал '{interval}' должен быть положительным целым числом.")
         print(f"Ошибка: Интервал '{interval}' должен быть положительным целым числом.")
         return
 
@@ -359,7 +977,7 @@ def update_sleep_interval(interval):
     config['interval'] = interval
     save_json_file(config, PATH_TO_CONFIG_JSON)
 
-    logging.info(f"Интервал резервного копирования успешно изменён на {interval} секунд.")
+    logger.info(f"Интервал резервного копирования успешно изменён на {interval} секунд.")
     print(f"Интервал резервного копирования успешно изменён на {interval} секунд.")
 
 def change_backup_destination(new_path):
@@ -367,16 +985,16 @@ def change_backup_destination(new_path):
     absolute_new_path = remove_escape_characters(absolute_new_path)
 
     if not is_valid_mac_path(absolute_new_path):
-        logging.error(f"Ошибка: Путь '{new_path}' некорректен.")
+        logger.error(f"Ошибка: Путь '{new_path}' некорректен.")
         print(f"Ошибка: Путь '{new_path}' некорректен.")
         return
 
     if is_path_exist(absolute_new_path) != 'directory':
         try:
             os.makedirs(absolute_new_path)
-            logging.info(f"Создана новая директория для резервных копий: '{absolute_new_path}'.")
+            logger.info(f"Создана новая директория для резервных копий: '{absolute_new_path}'.")
         except OSError as e:
-            logging.error(f"Ошибка при создании директории '{absolute_new_path}': {e}")
+            logger.error(f"Ошибка при создании директории '{absolute_new_path}': {e}")
             print(f"Ошибка при создании директории '{absolute_new_path}': {e}")
             return
 
@@ -384,7 +1002,7 @@ def change_backup_destination(new_path):
     old_backup_folder = config.get('backup_destination', '')
 
     if is_path_exist(old_backup_folder) != 'directory':
-        logging.error(f"Ошибка: Старая папка резервного копирования '{old_backup_folder}' не существует.")
+        logger.error(f"Ошибка: Старая папка резервного копирования '{old_backup_folder}' не существует.")
         print(f"Ошибка: Старая папка резервного копирования '{old_backup_folder}' не существует.")
         return
 
@@ -401,33 +1019,23 @@ def change_backup_destination(new_path):
                 destination_file = os.path.join(destination_dir, file)
                 try:
                     shutil.move(source_file, destination_file)
-                    logging.info(f"Файл '{file}' перемещен в '{destination_file}'.")
+                    logger.info(f"Файл '{file}' перемещен в '{destination_file}'.")
                 except Exception as e:
-                    logging.error(f"Ошибка при перемещении файла '{source_file}': {e}")
+                    logger.error(f"Ошибка при перемещении файла '{source_file}': {e}")
 
         shutil.rmtree(old_backup_folder)
-        logging.info(f"Старая папка резервного копирования '{old_backup_folder}' успешно удалена.")
+        logger.info(f"Старая папка резервного копирования '{old_backup_folder}' успешно удалена.")
         print(f"Старая папка резервного копирования '{old_backup_folder}' успешно удалена.")
 
-        if os.path.exists(PATH_TO_CHECKSUMS_JSON):
-            try:
-                with open(PATH_TO_CHECKSUMS_JSON, 'w') as checksums_file:
-                    json.dump({}, checksums_file, indent=4)
-                logging.info(f"Файл контрольных сумм '{PATH_TO_CHECKSUMS_JSON}' успешно очищен.")
-                print(f"Файл контрольных сумм '{PATH_TO_CHECKSUMS_JSON}' успешно очищен.")
-            except Exception as e:
-                logging.error(f"Ошибка при очистке файла контрольных сумм '{PATH_TO_CHECKSUMS_JSON}': {e}")
-        else:
-            logging.warning(f"Файл контрольных сумм '{PATH_TO_CHECKSUMS_JSON}' не найден для очистки.")
-            print(f"Файл контрольных сумм '{PATH_TO_CHECKSUMS_JSON}' не найден для очистки.")
+        clear_checksums_db(PATH_TO_CHECKSUMS_DB)
 
         config['backup_destination'] = absolute_new_path
         save_json_file(config, PATH_TO_CONFIG_JSON)
-        logging.info(f"Папка для резервного копирования успешно изменена на '{absolute_new_path}'.")
+        logger.info(f"Папка для резервного копирования успешно изменена на '{absolute_new_path}'.")
         print(f"Папка для резервного копирования успешно изменена на '{absolute_new_path}'.")
 
     except Exception as e:
-        logging.error(f"Ошибка при перемещении файлов или изменении папки резервного копирования: {e}")
+        logger.error(f"Ошибка при перемещении файлов или изменении папки резервного копирования: {e}")
         print(f"Ошибка при перемещении файлов или изменении папки резервного копирования: {e}")
 
 def clear_backup_folder():
@@ -435,7 +1043,7 @@ def clear_backup_folder():
     backup_folder = config.get('backup_destination', '')
 
     if is_path_exist(backup_folder) != 'directory':
-        logging.error(f"Ошибка: Папка для резервного копирования '{backup_folder}' не существует или не является директорией.")
+        logger.error(f"Ошибка: Папка для резервного копирования '{backup_folder}' не существует или не является директорией.")
         print(f"Ошибка: Папка для резервного копирования '{backup_folder}' не существует или не является директорией.")
         return
 
@@ -445,30 +1053,20 @@ def clear_backup_folder():
                 try:
                     os.remove(os.path.join(root, file))
                 except Exception as e:
-                    logging.error(f"Ошибка при удалении файла '{file}': {e}")
+                    logger.error(f"Ошибка при удалении файла '{file}': {e}")
             for dir in dirs:
                 try:
                     shutil.rmtree(os.path.join(root, dir))
                 except Exception as e:
-                    logging.error(f"Ошибка при удалении директории '{dir}': {e}")
+                    logger.error(f"Ошибка при удалении директории '{dir}': {e}")
 
-        logging.info(f"Папка для резервного копирования '{backup_folder}' успешно очищена.")
+        logger.info(f"Папка для резервного копирования '{backup_folder}' успешно очищена.")
         print(f"Папка для резервного копирования '{backup_folder}' успешно очищена.")
 
-        if os.path.exists(PATH_TO_CHECKSUMS_JSON):
-            try:
-                with open(PATH_TO_CHECKSUMS_JSON, 'w') as checksums_file:
-                    json.dump({}, checksums_file, indent=4)
-                logging.info(f"Файл контрольных сумм '{PATH_TO_CHECKSUMS_JSON}' успешно очищен.")
-                print(f"Файл контрольных сумм '{PATH_TO_CHECKSUMS_JSON}' успешно очищен.")
-            except Exception as e:
-                logging.error(f"Ошибка при очистке файла контрольных сумм '{PATH_TO_CHECKSUMS_JSON}': {e}")
-        else:
-            logging.warning(f"Файл контрольных сумм '{PATH_TO_CHECKSUMS_JSON}' не найден для очистки.")
-            print(f"Файл контрольных сумм '{PATH_TO_CHECKSUMS_JSON}' не найден для очистки.")
+        clear_checksums_db(PATH_TO_CHECKSUMS_DB)
 
     except Exception as e:
-        logging.error(f"Ошибка при очистке папки или файла контрольных сумм: {e}")
+        logger.error(f"Ошибка при очистке папки или файла контрольных сумм: {e}")
         print(f"Ошибка при очистке папки или файла контрольных сумм: {e}")
 
 def paste_backup(target_dir):
@@ -476,12 +1074,12 @@ def paste_backup(target_dir):
     absolute_target_dir = remove_escape_characters(absolute_target_dir)
 
     if not is_valid_mac_path(absolute_target_dir):
-        logging.error(f"Ошибка: Путь '{target_dir}' некорректен.")
+        logger.error(f"Ошибка: Путь '{target_dir}' некорректен.")
         print(f"Ошибка: Путь '{target_dir}' некорректен.")
         return
 
     if is_path_exist(absolute_target_dir) != 'directory':
-        logging.error(f"Ошибка: Путь '{absolute_target_dir}' не существует или не является директорией.")
+        logger.error(f"Ошибка: Путь '{absolute_target_dir}' не существует или не является директорией.")
         print(f"Ошибка: Путь '{absolute_target_dir}' не существует или не является директорией.")
         return
 
@@ -489,12 +1087,16 @@ def paste_backup(target_dir):
     backup_folder = config.get('backup_destination', '')
 
     if is_path_exist(backup_folder) != 'directory':
-        logging.error(f"Ошибка: Папка для резервного копирования '{backup_folder}' не существует.")
+        logger.error(f"Ошибка: Папка для резервного копирования '{backup_folder}' не существует.")
         print(f"Ошибка: Папка для резервного копирования '{backup_folder}' не существует.")
         return
 
     try:
         for root, dirs, files in os.walk(backup_folder):
+            if root == backup_folder:
+                # Хранилище чанков и рецепты восстанавливаются отдельно
+                dirs[:] = [dir for dir in dirs if dir not in (CAS_FOLDER_NAME, RECIPES_FOLDER_NAME)]
+
             relative_path = os.path.relpath(root, backup_folder)
             destination_dir = os.path.join(absolute_target_dir, relative_path)
 
@@ -506,10 +1108,15 @@ def paste_backup(target_dir):
                 destination_file = os.path.join(destination_dir, file)
                 shutil.copy2(source_file, destination_file)
 
-        logging.info(f"Файлы успешно восстановлены из резервной копии в папку '{absolute_target_dir}'.")
+        failed_files_count = restore_chunked_files(backup_folder, absolute_target_dir)
+        if failed_files_count:
+            logger.warning(f"Не удалось восстановить файлов из хранилища чанков: {failed_files_count}.")
+            print(f"Не удалось восстановить файлов из хранилища чанков: {failed_files_count}. Подробности в логе.")
+
+        logger.info(f"Файлы успешно восстановлены из резервной копии в папку '{absolute_target_dir}'.")
         print(f"Файлы успешно восстановлены из резервной копии в папку '{absolute_target_dir}'.")
     except Exception as e:
-        logging.error(f"Ошибка при восстановлении файлов: {e}")
+        logger.error(f"Ошибка при восстановлении файлов: {e}")
         print(f"Ошибка при восстановлении файлов: {e}")
 
 def show_logs():
@@ -517,30 +1124,40 @@ def show_logs():
     log_file = LOG_FILE_PATH
 
     try:
-        with open(log_file, 'r') as f:
-            lines = f.readlines()[-50:]
-            for line in lines:
-                print(line, end="")
+        with open(log_file, 'rb') as f:
+            # Читаем файл с конца блоками по 8 КиБ, пока не наберётся 50 строк,
+            # чтобы не загружать в память весь лог
+            position = f.seek(0, os.SEEK_END)
+            buffer = b''
+            while position > 0 and buffer.count(b'\n') <= 50:
+                step = min(8192, position)
+                position -= step
+                f.seek(position)
+                buffer = f.read(step) + buffer
+        lines = buffer.splitlines(keepends=True)[-50:]
+        sys.stdout.flush()
+        sys.stdout.buffer.write(b''.join(lines))
+        sys.stdout.buffer.flush()
     except FileNotFoundError:
-        logging.warning(f"Файл логов '{log_file}' не найден.")
+        logger.warning(f"Файл логов '{log_file}' не найден.")
         print(f"Файл логов '{log_file}' не найден.")
     except Exception as e:
-        logging.error(f"Ошибка при чтении файла логов: {e}")
+        logger.error(f"Ошибка при чтении файла логов: {e}")
         print(f"Ошибка при чтении файла логов: {e}")
 
 def restart():
     try:
-        logging.info("Попытка перезапуска демона...")
+        logger.info("Попытка перезапуска демона...")
         print("Перезапуск демона...")
 
         stop_daemon()
         start_daemon()
 
-        logging.info("Демон успешно перезапущен.")
+        logger.info("Демон успешно перезапущен.")
         print("Демон успешно перезапущен.")
 
     except Exception as e:
-        logging.error(f"Ошибка при перезапуске демона: {e}")
+        logger.error(f"Ошибка при перезапуске демона: {e}")
         print(f"Ошибка при перезапуске демона: {e}")
 
 def main():